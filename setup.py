@@ -7,5 +7,12 @@ setup(
     package_dir={"": "src"},
     install_requires=[
         "pydantic>=2.1.1"
-    ]
+    ],
+    extras_require={
+        "speedups": [
+            "httptools",
+            "orjson",
+            "uvloop; sys_platform != 'win32'"
+        ]
+    }
 )
@@ -1,8 +1,9 @@
 import enum
+import functools
 import inspect
 import re
-from typing import Callable, Tuple, Set, Dict, Optional, Any, List
-from pydantic import BaseModel
+from typing import Callable, Tuple, Set, FrozenSet, Dict, Optional, Any, List
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from .params import PathList, QueryList, Headers, Cookies, Body
 from .exceptions import HttpException
 
@@ -15,6 +16,50 @@ class Method(str, enum.Enum):
     DELETE = "DELETE"
 
 
+_PATH_PARAM_RE = re.compile(r'\{([^{}]+)\}')
+
+
+@functools.lru_cache(maxsize=None)
+def get_type_adapter(model: type) -> TypeAdapter:
+    '''
+    Returns the TypeAdapter for given model, so that its core schema is built only once across all routes.
+    '''
+    return TypeAdapter(model)
+
+
+_KWARG_SOURCES = {
+    "header": "request.headers.header_params[{!r}]",
+    "cookie": "request.headers.cookies._params[{!r}]",
+    "path": "request.path_params._path_params[{!r}]",
+    "body": "request.body.value",
+    "request": "request",
+    "query": "request.queries._queries[{!r}]",
+}
+
+
+def compile_kwargs_builder(path_info: "PathInfo") -> Callable:
+    '''
+    Generates a function which picks the handler kwargs out of a request. The source of every
+    parameter is fixed at registration, so it is hard coded instead of being looked up per request.
+    '''
+    items = []
+    for varname, kind in path_info.param_kinds.items():
+        source = _KWARG_SOURCES[kind].format(varname)
+        items.append(f"            {varname!r}: {source},\n")
+    code = (
+        "def build_kwargs(request):\n"
+        "    try:\n"
+        "        return {\n"
+        f"{''.join(items)}"
+        "        }\n"
+        "    except KeyError as e:\n"
+        "        raise HttpException(422, f\"{e.args[0]} not provided.\")\n"
+    )
+    namespace = {"HttpException": HttpException}
+    exec(code, namespace)
+    return namespace["build_kwargs"]
+
+
 class PathInfo:
     '''
     This class is responsible for saving all the meta data regarding a defined route and its handler.
@@ -23,141 +68,246 @@ class PathInfo:
         self,
         route: str,
         handler: Callable,
-        path_params: Tuple[str] = tuple(),
-        query_params: Set[str] = set(),
-        headers: Set[str] = set(),
-        cookies: Set[str] = set(),
-        defaults: Dict[str, Any] = {},
-        var_types: Dict[str, Callable] = {},
+        path_params: Optional[Tuple[str]] = None,
+        query_params: Optional[FrozenSet[str]] = None,
+        headers: Optional[Set[str]] = None,
+        cookies: Optional[Set[str]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        var_types: Optional[Dict[str, Callable]] = None,
         body: Optional[str] = None,
         response_model: Optional[BaseModel] = None,
         request_param: Optional[str] = None
     ) -> None:
         self.route = route
-        self.path_params = path_params
-        self.query_params = query_params
-        self.headers = headers
-        self.cookies = cookies
-        self.defaults = defaults
-        self.var_types = var_types
+        self.path_params = tuple() if path_params is None else path_params
+        self.query_params = frozenset() if query_params is None else frozenset(query_params)
+        self.headers = set() if headers is None else headers
+        self.cookies = set() if cookies is None else cookies
+        self.defaults = {} if defaults is None else defaults
+        self.var_types = {} if var_types is None else var_types
         self.handler = handler
         self.body = body
         self.response_model = response_model
         self.request_param = request_param
+        self.converters: Dict[str, Optional[Callable]] = {
+            name: None if var_type is str else var_type for name, var_type in self.var_types.items()
+        }
+        self.path_converters = tuple(self.converters.get(p) for p in self.path_params)
+        self.typed_defaults = {
+            name for name, default in self.defaults.items()
+            if isinstance(self.var_types.get(name), type) and isinstance(default, self.var_types[name])
+        }
+        self.is_coroutine = inspect.iscoroutinefunction(handler)
+        if "return" not in self.var_types:
+            self.return_kind = "unchecked"
+        elif response_model is None:
+            self.return_kind = "none"
+        elif isinstance(response_model, type) and issubclass(response_model, BaseModel):
+            self.return_kind = "model"
+        else:
+            self.return_kind = "callable"
+        self.param_kinds: Dict[str, str] = {}
+        for varname in self.var_types:
+            if varname in self.headers:
+                self.param_kinds[varname] = "header"
+            elif varname in self.cookies:
+                self.param_kinds[varname] = "cookie"
+            elif varname in self.path_params:
+                self.param_kinds[varname] = "path"
+            elif varname == self.body:
+                self.param_kinds[varname] = "body"
+            elif varname == self.request_param:
+                self.param_kinds[varname] = "request"
+            elif varname in self.query_params:
+                self.param_kinds[varname] = "query"
+        self.build_kwargs = compile_kwargs_builder(self)
+        self.body_adapter = get_type_adapter(self.var_types[body]) if body is not None else None
+        self.response_adapter = get_type_adapter(response_model) if self.return_kind == "model" else None
 
-    def verify_path_params(self, *args) -> PathList:
+    def convert_path_params(self, values: List[str]) -> Dict[str, Any]:
         '''
-        Validates the path params.
+        Converts the raw path segments captured while routing to their annotated types.
         '''
-        path = PathList()
-        for p, pval in zip(self.path_params, args):
+        converted = {}
+        for p, converter, pval in zip(self.path_params, self.path_converters, values):
+            if converter is None:
+                converted[p] = pval
+                continue
             try:
-                path.add_path(p, self.var_types[p](pval))
+                converted[p] = converter(pval)
             except:
-                raise HttpException(
-                    422, f"{p}, Expected type {self.var_types[p]}, Found {type(pval)}. Value {pval}")
+                raise HttpException(404, "No route found.")
+        return converted
+
+    def verify_path_params(self, **kwargs) -> PathList:
+        '''
+        Validates the path params. Values are expected to be already converted while routing.
+        '''
+        path = PathList()
+        for p in self.path_params:
+            if p not in kwargs:
+                raise HttpException(422, f"{p} not given in path params.")
+            path.add_path(p, kwargs[p])
         return path
 
-    def verify_query_params(self, **kwargs) -> QueryList:
-        query_list = QueryList()
-        for q in self.query_params:
-            if q not in kwargs and q in self.defaults:
-                raise HttpException(422, f"{q} not given in query params.")
-            var_type = self.var_types[q]
-            if q in kwargs:
-                q_val = kwargs.get(q)
+    def _convert(self, name: str, value: Any) -> Any:
+        converter = self.converters[name]
+        if converter is None:
+            return value
+        try:
+            return converter(value)
+        except:
+            raise HttpException(
+                422, f"{name}, Expected type {self.var_types[name]}, Found {type(value)}. Value {value}")
+
+    def _default(self, name: str) -> Any:
+        default = self.defaults[name]
+        if name in self.typed_defaults:
+            return default
+        try:
+            return self.var_types[name](default)
+        except:
+            raise HttpException(
+                422, f"{name}, Expected type {self.var_types[name]}, Found {type(default)}. Value {default}")
+
+    def verify_query_params(self, queries: Dict[str, Any]) -> QueryList:
+        '''
+        Validates the query params. The given dict is adopted as the QueryList storage and only
+        the declared params are converted in place.
+        '''
+        for name in self.query_params:
+            if name in queries:
+                queries[name] = self._convert(name, queries[name])
+            elif name in self.defaults:
+                queries[name] = self._default(name)
             else:
-                q_val = self.defaults[q]
-            try:
-                q_val = var_type(q_val)
-                query_list.add_query(q, q_val, True)
-            except:
-                raise HttpException(
-                    422, f"{q}, Expected type {self.var_types[q]}, Found {type(q_val)}. Value {q_val}")
-        for extra_q in set(kwargs.keys()).difference(self.query_params):
-            query_list.add_query(extra_q, kwargs[extra_q], False)
+                raise HttpException(422, f"{name} not given in query params.")
+        query_list = QueryList()
+        query_list._queries = queries
+        query_list._pre_defined = self.query_params
         return query_list
 
     def verify_cookies(self, cookies_str: str) -> Cookies:
         cookies = Cookies.from_string(cookies_str)
+        # Request cookies only carry values, update_cookie would turn them into Set-Cookie lines.
+        values = cookies._params
         for c in self.cookies:
-            if c not in cookies and c not in self.defaults:
-                raise HttpException(422, f"{c} not given in cookies.")
-            var_type = self.var_types[c]
-            if c in cookies:
-                c_val = cookies.get(c).value
+            if c in values:
+                values[c] = self._convert(c, values[c])
+            elif c in self.defaults:
+                values[c] = self._default(c)
             else:
-                c_val = self.defaults[c]
-            try:
-                cookies.update_cookie(name=c, value=var_type(c_val))
-            except:
-                raise HttpException(
-                    422, f"{c}, Expected type {self.var_types[c]}, Found {type(c_val)}. Value {c_val}")
+                raise HttpException(422, f"{c} not given in cookies.")
         return cookies
 
-    def verify_headers(self, **kwargs) -> Headers:
+    def verify_headers(self, header_params: Dict[str, Any]) -> Headers:
+        '''
+        Validates the headers, whose names are expected to be lowercased. Like query params, the given
+        dict is adopted as the header storage and only the declared headers are converted in place.
+        '''
         headers = Headers()
-        for h in self.headers:
-            if h not in kwargs and h not in self.defaults:
-                raise HttpException(422, f"{h} not given in headers.")
-            var_type = self.var_types[h]
-            if h in kwargs:
-                h_val = kwargs[h]
+        cookies = header_params.pop("cookie", None)
+        if cookies is not None or self.cookies:
+            headers.set_cookies(self.verify_cookies("" if cookies is None else cookies))
+        for name in self.headers:
+            if name in header_params:
+                header_params[name] = self._convert(name, header_params[name])
+            elif name in self.defaults:
+                header_params[name] = self._default(name)
             else:
-                h_val = self.defaults[h]
-            try:
-                h_val = var_type(h_val)
-                headers.add_header(h, h_val)
-            except:
-                raise HttpException(
-                    422, f"{h}, Expected type {self.var_types[h]}, Found {type(h_val)}. Value {h_val}")
-        for extra_h in set(kwargs.keys()).difference(self.headers):
-            if extra_h.casefold() == "cookie":
-                cookies = self.verify_cookies(kwargs[extra_h])
-                headers.set_cookies(cookies)
-            else:
-                headers.add_header(extra_h, kwargs[extra_h])
+                raise HttpException(422, f"{name} not given in headers.")
+        headers.header_params = header_params
         return headers
 
     def verify_body(self, value: Any) -> Body:
+        '''
+        Validates the body. Raw json (bytes or str) is validated directly without being parsed first.
+        '''
         if self.body is not None:
-            var_type = self.var_types[self.body]
             try:
-                if isinstance(value, str):
-                    return Body(var_type.model_validate_json(value))
+                if isinstance(value, (str, bytes)):
+                    return Body(self.body_adapter.validate_json(value))
                 else:
-                    return Body(var_type.model_validate(value))
+                    return Body(self.body_adapter.validate_python(value))
+            except ValidationError as e:
+                if any(error["type"] == "json_invalid" for error in e.errors()):
+                    raise HttpException(400, "Invalid json body.")
+                raise HttpException(422, str(e))
             except Exception as e:
-                print(e)
                 raise HttpException(422, str(e))
         else:
             return Body(value)
 
+    def verify_response(self, res: Any) -> Any:
+        '''
+        Validates the value returned by handler against the return annotation, if any.
+        '''
+        return_kind = self.return_kind
+        if return_kind == "unchecked":
+            return res
+        return_type = self.response_model
+        if return_kind == "none":
+            if res is not None:
+                raise HttpException(
+                    500, f"Return type could not be verified. Expected {return_type}, Found {type(res)}")
+            return res
+        if return_kind == "model":
+            if isinstance(res, return_type):
+                return res
+            try:
+                if isinstance(res, (str, bytes)):
+                    return self.response_adapter.validate_json(res)
+                return self.response_adapter.validate_python(res)
+            except Exception:
+                raise HttpException(
+                    500, f"Return type could not be verified. Expected {return_type}, Found {type(res)}"
+                )
+        try:
+            return return_type(res)
+        except:
+            raise HttpException(
+                500, f"Return type could not be verified. Expected {return_type}, Found {type(res)}"
+            )
+
+
+class RouteNode:
+    '''
+    A node of the routes trie. Each node stands for one path segment, static segments are
+    looked up in a dict and all the path params at this position share one dynamic child.
+    '''
+    __slots__ = ("static", "dynamic", "path_info")
+
+    def __init__(self) -> None:
+        self.static: Dict[str, "RouteNode"] = {}
+        self.dynamic: Optional["RouteNode"] = None
+        self.path_info: Optional[PathInfo] = None
+
 
 class RegisteredPaths:
-    '''This class is responsible for storing path info in a dict with key being the base path.'''
+    '''This class is responsible for storing path info in a trie of path segments.'''
     def __init__(self) -> None:
-        self.paths: Dict[str, List[PathInfo]] = {}
+        self.paths: Dict[str, PathInfo] = {}
+        self._root = RouteNode()
+        # Routes without path params, keyed by the stripped route, are matched with one dict lookup.
+        self._static: Dict[str, PathInfo] = {}
 
     def __len__(self) -> int:
-        cnt = 0
-        for _, paths in self.paths.items():
-            cnt += len(paths)
-        return cnt
+        return len(self.paths)
 
-    def _get_path_params(self, route: str) -> Tuple[str, Tuple[str]]:
-        pattern = r'\{([^{}]+)\}'
-        parts = re.split(pattern, route, 1)
-        variable_names = re.findall(pattern, route)
-        return parts[0], variable_names
+    @staticmethod
+    def _split_route(route: str) -> List[str]:
+        return route.strip("/").split("/")
+
+    def _get_path_params(self, route: str) -> Tuple[str]:
+        return tuple(_PATH_PARAM_RE.findall(route))
 
     def add_api_route(self, route: str, function: Callable) -> None:
         '''
-        Adds new route and given function will be called when this route is hit.
+        Adds new route and given function will be called when this route is hit. Registering a route
+        again, or one which differs from a registered route only in path param names, raises ValueError.
         '''
         from .requests import Request
-        original_route, params = self._get_path_params(route)
-        params = set(params)
+        params = self._get_path_params(route)
         function_details = inspect.getfullargspec(function)
         annotations = function_details.annotations
         args = function_details.args
@@ -179,7 +329,7 @@ class RegisteredPaths:
                 cookies.add(varname)
             elif varname in params or "return" == varname:
                 continue
-            elif issubclass(var_type, BaseModel):
+            elif isinstance(var_type, type) and issubclass(var_type, BaseModel):
                 body = varname
             elif annotations[varname] == Request:
                 request = varname
@@ -188,8 +338,6 @@ class RegisteredPaths:
         response_model = None
         if "return" in annotations:
             response_model = annotations["return"]
-        if original_route.endswith("/"):
-            original_route = original_route[:-1]
         path_info = PathInfo(
             route=route,
             handler=function,
@@ -203,36 +351,61 @@ class RegisteredPaths:
             response_model=response_model,
             request_param=request
         )
-        if original_route in self.paths:
-            self.paths[original_route].append(path_info)
-        else:
-            self.paths[original_route] = [path_info]
+        node = self._root
+        for segment in self._split_route(route):
+            if _PATH_PARAM_RE.fullmatch(segment):
+                if node.dynamic is None:
+                    node.dynamic = RouteNode()
+                node = node.dynamic
+            else:
+                node = node.static.setdefault(segment, RouteNode())
+        if node.path_info is not None:
+            raise ValueError(f"Route {route} conflicts with already registered route {node.path_info.route}.")
+        node.path_info = path_info
+        self.paths[route] = path_info
+        if not params:
+            self._static[route.strip("/")] = path_info
+
+    def _find(self, node: RouteNode, segments: List[str], idx: int, values: List[str]) -> Optional[PathInfo]:
+        '''
+        Descends the trie preferring static segments and falls back to the dynamic child,
+        collecting the segments consumed by path params in values.
+        '''
+        if idx == len(segments):
+            return node.path_info
+        child = node.static.get(segments[idx])
+        if child is not None:
+            path_info = self._find(child, segments, idx + 1, values)
+            if path_info is not None:
+                return path_info
+        if node.dynamic is not None:
+            values.append(segments[idx])
+            path_info = self._find(node.dynamic, segments, idx + 1, values)
+            if path_info is not None:
+                return path_info
+            values.pop()
+        return None
+
+    def match(self, route: str) -> Optional[Tuple[PathInfo, Dict[str, Any]]]:
+        '''
+        Returns PathInfo along with converted path params for given route without query params.
+        '''
+        route = route.strip("/")
+        path_info = self._static.get(route)
+        if path_info is not None:
+            return path_info, {}
+        values = []
+        path_info = self._find(self._root, route.split("/"), 0, values)
+        if path_info is None:
+            return None
+        return path_info, path_info.convert_path_params(values)
 
     def get_api_path_info(self, route: str) -> Optional[PathInfo]:
         '''
         Returns PathInfo for given route without query params.
         '''
-        if route.endswith("/"):
-            route = route[:-1]
-        parts = route.split("/")
-        i = len(parts) - 1
-        while i >= 0:
-            cnt_path = "/".join(parts[:i+1])
-            if cnt_path not in self.paths:
-                i -= 1
-                continue
-            for pathinfo in self.paths[cnt_path]:
-                if len(parts) - i - 1 != len(pathinfo.path_params):
-                    continue
-                for var, var_val in zip(pathinfo.path_params, parts[i+1:]):
-                    if var in pathinfo.path_params:
-                        try:
-                            pathinfo.var_types[var](var_val)
-                        except:
-                            raise HttpException(404, "No route found.")
-                return pathinfo
-            i -= 1
-        return None
+        matched = self.match(route)
+        return matched[0] if matched is not None else None
 
 
 class MethodWisePathsInfo:
@@ -257,4 +430,11 @@ class MethodWisePathsInfo:
         if "?" in route:
             idx = route.find("?")
             route = route[:idx]
-        return self.paths[method].get_api_path_info(route)
+        matched = self.paths[method].match(route)
+        return matched[0] if matched is not None else None
+
+    def match_api_route(self, method: Method, route: str) -> Optional[Tuple[PathInfo, Dict[str, Any]]]:
+        '''
+        Returns PathInfo and converted path params for given route without query params.
+        '''
+        return self.paths[method].match(route)
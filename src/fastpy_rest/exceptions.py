@@ -1,8 +1,27 @@
 from typing import Optional
 import asyncio
+import os
 import traceback
-import json
-from .status_codes import HTTP_STATUS_CODES
+from .serialization import json_dumps
+from .status_codes import HTTP_STATUS_CODES, STATUS_LINE
+
+_debug = os.environ.get("FASTPY_DEBUG") == "1"
+
+
+def set_debug(debug: bool) -> None:
+    '''
+    Turns printing of unexpected errors on or off. It is off by default unless FASTPY_DEBUG=1 is set.
+    '''
+    global _debug
+    _debug = debug
+
+
+def log_exception(e: BaseException) -> None:
+    '''
+    Prints an unexpected error along with its traceback when debugging is on.
+    '''
+    if _debug:
+        traceback.print_exception(type(e), e, e.__traceback__)
 
 
 class HttpException(Exception):
@@ -17,25 +36,31 @@ class HttpException(Exception):
         if status_code not in HTTP_STATUS_CODES:
             raise HttpException(500, "Wrong http code defined.")
         self.status_code = status_code
-        self.detail = json.dumps({"detail": detail})
+        detail_bytes = json_dumps({"detail": detail})
+        self.detail = detail_bytes.decode()
+        self._wire = (
+            STATUS_LINE[status_code]
+            + b"Content-Type: application/json\r\nContent-Length: %d\r\n\r\n" % len(detail_bytes)
+            + detail_bytes
+        )
 
     def __str__(self) -> str:
-        s = f"HTTP/1.1 {self.status_code} {HTTP_STATUS_CODES[self.status_code]}\r\n"
-        if self.detail is not None:
-            s += "\r\n"
-            s += str(self.detail)
-        return s
+        return self._wire.decode()
+
+    def to_bytes(self) -> bytes:
+        '''
+        Returns the whole response, which is assembled once when the exception is created.
+        '''
+        return self._wire
 
     async def write_to_stream(self, writer: asyncio.StreamWriter) -> None:
         '''
         This writes to stream.
         '''
         try:
-            writer.write(str(self).encode())
+            writer.write(self.to_bytes())
         except Exception as e:
-            print(e)
-            traceback.print_exc()
-            writer.write("HTTP/1.1 500 Internal Server\r\n".encode())
+            log_exception(e)
+            writer.write(STATUS_LINE[500] + b"Content-Length: 0\r\n\r\n")
         finally:
             await writer.drain()
-            writer.close()
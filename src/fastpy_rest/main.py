@@ -1,13 +1,19 @@
 import asyncio
-import traceback
-import inspect
+import sys
 from typing import Callable, Optional, Dict, Any
-from pydantic import BaseModel
 from .core import MethodWisePathsInfo, Method
-from .requests import Request
+from .requests import Request, RequestParser
 from .responses import Response
-from .params import HeaderParam, Headers, Body
-from .exceptions import HttpException
+from .params import Body
+from .exceptions import HttpException, log_exception, set_debug
+from .status_codes import STATUS_LINE
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+_JSON_200_HEAD = STATUS_LINE[200] + b"Content-Type: Application/Json\r\nContent-Length: %d\r\n\r\n"
 
 class FastPy:
     def __init__(self) -> None:
@@ -77,12 +83,25 @@ class FastPy:
             return None
         return wrapper
     
-    def run(self, host: str="localhost", port: int=8080, debug=False) -> None:
-        ServerHandler(self, host, port, debug).start_server()
+    def run(
+        self,
+        host: str="localhost",
+        port: int=8080,
+        debug=False,
+        use_uvloop: bool=True,
+        keep_alive_timeout: float=5.0
+    ) -> None:
+        '''
+        Runs the server at given host and port. uvloop is used as event loop when it is installed,
+        unless use_uvloop is False. With debug, unexpected errors are printed along with their traceback.
+        Idle connections are closed after keep_alive_timeout seconds.
+        '''
+        ServerHandler(self, host, port, debug, use_uvloop, keep_alive_timeout).start_server()
 
 
 class RequestHandler:
     _app: Optional[FastPy] = None
+    keep_alive_timeout: float = 5.0
 
     @classmethod
     def set_app(cls, app: FastPy) -> None:
@@ -90,97 +109,84 @@ class RequestHandler:
 
     @classmethod
     def get_valid_params_dict(cls, request: Request) -> Dict[str, Any]:
-        param_val_dict = {
-                **request.path_params.dict(),
-                **request.queries.dict(),
-                **request.headers.dict()
-            }
-
-        kwargs = {}
-        for varname, _ in request.annotations.items():
-            if varname in param_val_dict:
-                kwargs[varname] = param_val_dict[varname]
-            else:
-                if varname == request.body_param:
-                    kwargs[varname] = request.body.value
-                elif varname == request.request_param:
-                    kwargs[varname] = request
-                elif varname == "return":
-                    continue
-                else:
-                    raise HttpException(422, f"{varname} not provided.")
-        return kwargs
+        return request.path_info.build_kwargs(request)
 
     @classmethod
     async def handle_request(cls, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Serves requests from a connection one after another until the client closes it, the request
+        does not allow to keep it alive or no request arrives within keep_alive_timeout seconds.
+        '''
+        try:
+            while True:
+                try:
+                    parser = await RequestParser.read_from(reader, cls.keep_alive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except HttpException as e:
+                    await e.write_to_stream(writer)
+                    break
+                await cls.handle_parsed_request(parser, writer)
+                if not parser.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @classmethod
+    async def handle_parsed_request(cls, parser: RequestParser, writer: asyncio.StreamWriter) -> None:
         try:
-            request: Request = await Request.load_from_reader(reader, cls._app._method_wise_path_info)
+            request: Request = Request.from_parser(parser, cls._app._method_wise_path_info)
             kwargs = cls.get_valid_params_dict(request)
-            if inspect.isawaitable(request.handler) or inspect.iscoroutinefunction(request.handler) or inspect.iscoroutine(request.handler):
+            if request.path_info.is_coroutine:
                 res = await request.handler(**kwargs)
             else:
                 res = request.handler(**kwargs)
-            if "return" in request.annotations:
-                return_type = request.annotations["return"]
-                if return_type is None and res is not None:
-                    raise HttpException(
-                        500, f"Return type could not be verified. Expected {return_type}, Found {type(res)}")
-                elif issubclass(return_type, BaseModel):
-                    if isinstance(res, return_type):
-                        pass
-                    else:
-                        try:
-                            if isinstance(res, str):
-                                res = return_type.model_validate_json(res)
-                            else:
-                                res = return_type.model_validate(res)
-                        except Exception as e:
-                            raise HttpException(
-                                500, f"Return type could not be verified. Expected {return_type}, Found {type(res)}"
-                            )
-                else:
-                    try:
-                        res = return_type(res)
-                    except:
-                        raise HttpException(
-                            500, f"Return type could not be verified. Expected {return_type}, Found {type(res)}"
-                        )
             if not isinstance(res, Response):
-                res = Response(
-                    200,
-                    Headers(cookies=None, header_params=[
-                            HeaderParam("Content-Type", "Application/Json")]),
-                    Body(res)
-                )
-        except Exception as e:
+                payload = Body(request.path_info.verify_response(res)).to_bytes()
+                res = None
+        except HttpException as e:
             res = e
-        try:
-            await res.write_to_stream(writer)
         except Exception as e:
-            print(e)
-            traceback.print_exc()
-            await Response(500).write_to_stream(writer)
+            log_exception(e)
+            res = Response(500)
+        if res is None:
+            # Plain return values always make a 200 json response, which needs no Response object.
+            writer.write(_JSON_200_HEAD % len(payload) + payload)
+            await writer.drain()
+            return
+        await res.write_to_stream(writer)
 
 class ServerHandler:
-    server = None
-
     def __init__(
         self,
         app: FastPy,
         host: str, 
         port: int,
-        debug: bool
+        debug: bool,
+        use_uvloop: bool = True,
+        keep_alive_timeout: float = 5.0
     )-> None:
         ServerHandler.app = app
         ServerHandler.host = host
         ServerHandler.port = port
         ServerHandler.debug = debug
+        ServerHandler.use_uvloop = use_uvloop
+        ServerHandler.keep_alive_timeout = keep_alive_timeout
+        if debug:
+            set_debug(True)
 
     @classmethod
     async def _start_server(
         cls
     ) -> None:
         RequestHandler.set_app(cls.app)
+        RequestHandler.keep_alive_timeout = cls.keep_alive_timeout
         server = await asyncio.start_server(RequestHandler.handle_request, cls.host, cls.port)
         addr = server.sockets[0].getsockname()
         print("Server running at", addr)
@@ -194,4 +200,11 @@ class ServerHandler:
         '''
         Starts a web server at given host and port and maps the given app with this port.
         '''
-        cls.server = asyncio.create_task(asyncio.run(cls._start_server()))
+        if cls.use_uvloop and uvloop is not None:
+            if sys.version_info >= (3, 11):
+                # Event loop policies are deprecated, the loop is passed to the runner instead.
+                with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                    runner.run(cls._start_server())
+                return
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(cls._start_server())
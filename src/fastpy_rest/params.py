@@ -1,10 +1,15 @@
 from typing import Any, Optional, List, Dict, Set
 from pydantic import BaseModel
-import json
 import datetime
+import re
+from .serialization import json_dumps
+
+_COOKIE_RE = re.compile(r'([^=;\s]+)\s*=([^;]*)')
 
 
 class Query:
+    __slots__ = ("name", "value", "pre_defined")
+
     def __init__(
         self,
         name: str,
@@ -23,6 +28,8 @@ class Query:
 
 
 class PathParam:
+    __slots__ = ("name", "value")
+
     def __init__(
         self,
         name: str,
@@ -33,6 +40,8 @@ class PathParam:
 
 
 class HeaderParam:
+    __slots__ = ("name", "value")
+
     def __init__(
         self,
         name: str,
@@ -49,6 +58,8 @@ class HeaderParam:
 
 
 class Body:
+    __slots__ = ("value",)
+
     def __init__(
         self,
         value: Any
@@ -56,17 +67,24 @@ class Body:
         self.value = value
 
     def __str__(self) -> str:
+        if isinstance(self.value, str):
+            return self.value
+        return self.to_bytes().decode()
+
+    def to_bytes(self) -> bytes:
         if isinstance(self.value, BaseModel):
-            return self.value.model_dump_json()
-        elif not isinstance(self.value, str):
-            return json.dumps(self.value)
-        return self.value
+            return self.value.__pydantic_serializer__.to_json(self.value)
+        elif isinstance(self.value, str):
+            return self.value.encode()
+        return json_dumps(self.value)
 
     def __repr__(self) -> str:
         return str(self)
 
 
 class Cookie:
+    __slots__ = ("name", "value", "expires", "max_age", "domain", "path", "same_site", "priority", "secure", "http_only")
+
     def __init__(
         self,
         name: str,
@@ -92,37 +110,36 @@ class Cookie:
         self.http_only = http_only
 
     def __str__(self) -> str:
-        s = ""
-        s += f"{self.name}={self.value}"
+        parts = [f"{self.name}={self.value}"]
         if self.expires is not None:
-            s += f"; Expires={self.expires.isoformat()}"
+            parts.append(f"Expires={self.expires.isoformat()}")
         if self.max_age is not None:
-            s += f"; Max-Age={self.max_age}"
+            parts.append(f"Max-Age={self.max_age}")
         if self.domain is not None:
-            s += f"; Domain={self.domain}"
+            parts.append(f"Domain={self.domain}")
         if self.path is not None:
-            s += f"; Path={self.path}"
+            parts.append(f"Path={self.path}")
         if self.same_site is not None:
-            s += f"; SameSite={self.same_site}"
+            parts.append(f"SameSite={self.same_site}")
         if self.priority is not None:
-            s += f"; Priority={self.priority}"
+            parts.append(f"Priority={self.priority}")
         if self.secure:
-            s += f"; Secure"
+            parts.append("Secure")
         if self.http_only:
-            s += f"; HttpOnly"
-        return s
+            parts.append("HttpOnly")
+        return "; ".join(parts)
 
 
 class Cookies:
-    def __init__(self, cookie_params: List[Cookie] = []) -> None:
-        self._params = {c.name: c for c in cookie_params}
+    __slots__ = ("_params", "_cookies")
+
+    def __init__(self, cookie_params: Optional[List[Cookie]] = None) -> None:
+        cookie_params = [] if cookie_params is None else cookie_params
+        self._params = {c.name: c.value for c in cookie_params}
+        self._cookies = {c.name: c for c in cookie_params}
 
     def __str__(self) -> str:
-        s = ""
-        for cookie in self._params.values():
-            s += f"Set-Cookie: {str(cookie)}"
-            s += "\r\n"
-        return s
+        return "".join(f"Set-Cookie: {cookie}\r\n" for cookie in self._cookies.values())
 
     def __repr__(self) -> str:
         return str(self)
@@ -131,70 +148,93 @@ class Cookies:
         return c in self._params
 
     def get(self, c: str) -> Cookie:
-        return self._params[c]
+        if c in self._cookies:
+            return self._cookies[c]
+        return Cookie(c, self._params[c])
 
     @property
     def cookie_names(self) -> Set[str]:
         return set(self._params.keys())
 
     def add(self, cookie: Cookie) -> None:
-        self._params[cookie.name] = cookie
+        self._params[cookie.name] = cookie.value
+        self._cookies[cookie.name] = cookie
 
     def update_cookie(self, name: str, value: Any) -> None:
-        self._params[name] = Cookie(name, value)
+        self._params[name] = value
+        self._cookies[name] = Cookie(name, value)
 
     def dict(self) -> Dict[str, Any]:
-        return {c.name: c.value for c in self._params.values()}
+        return self._params
 
     @classmethod
     def from_string(cls, s: str) -> "Cookies":
+        '''
+        Parses a request Cookie header. Only values are stored, so they are not sent back as Set-Cookie.
+        '''
         cookies = cls()
-        for cookie in s.split("; "):
-            [k, v] = cookie.split("=")
-            cookies._params[k.strip()] = Cookie(k.strip(), v.strip())
+        for k, v in _COOKIE_RE.findall(s):
+            cookies._params[k] = v.strip()
         return cookies
 
 
 class QueryList:
-    def __init__(self, queries: List[Query] = []) -> None:
-        self._queries = {q.name: q for q in queries}
+    __slots__ = ("_queries", "_pre_defined")
+
+    def __init__(self, queries: Optional[List[Query]] = None) -> None:
+        queries = [] if queries is None else queries
+        self._queries = {q.name: q.value for q in queries}
+        self._pre_defined = {q.name for q in queries if q.pre_defined}
 
     @property
     def queries(self) -> List[Query]:
-        return self._queries.values()
+        return [Query(name, value, name in self._pre_defined) for name, value in self._queries.items()]
 
     def add_query(self, name: str, value: Any, pre_defined: bool) -> None:
-        self._queries[name] = Query(name, value, pre_defined)
+        self._queries[name] = value
+        if pre_defined and name not in self._pre_defined:
+            # The set may be shared with the route, so it is copied instead of being mutated.
+            self._pre_defined = self._pre_defined | {name}
 
-    def dict(self) -> None:
-        return {q.name: q.value for q in self._queries.values()}
+    def dict(self) -> Dict[str, Any]:
+        return self._queries
 
 
 class PathList:
-    def __init__(self, path_params: List[PathParam] = []) -> None:
-        self._path_params = {p.name: p for p in path_params}
+    __slots__ = ("_path_params",)
+
+    def __init__(self, path_params: Optional[List[PathParam]] = None) -> None:
+        path_params = [] if path_params is None else path_params
+        self._path_params = {p.name: p.value for p in path_params}
 
     def add_path(self, name: str, value: Any) -> None:
-        self._path_params[name] = PathParam(name, value)
+        self._path_params[name] = value
 
     def dict(self) -> Dict[str, Any]:
-        return {p.name: p.value for p in self._path_params.values()}
+        return self._path_params
 
 
 class Headers:
-    def __init__(self, cookies: Optional[Cookies] = None, header_params: List[HeaderParam] = []) -> None:
+    __slots__ = ("cookies", "header_params")
+
+    def __init__(self, cookies: Optional[Cookies] = None, header_params: Optional[List[HeaderParam]] = None) -> None:
         self.cookies = cookies if cookies is not None else Cookies()
-        self.header_params = {h.name: h for h in header_params}
+        header_params = [] if header_params is None else header_params
+        self.header_params = {h.name: h.value for h in header_params}
 
     def __str__(self) -> str:
-        s = ""
-        for h in self.header_params.values():
-            s += f"{h.name}: {h.value}\r\n"
-        s += str(self.cookies)
-        return s
+        return "".join(f"{name}: {value}\r\n" for name, value in self.header_params.items()) + str(self.cookies)
+
+    def to_bytes(self) -> bytearray:
+        buf = bytearray()
+        for name, value in self.header_params.items():
+            buf += b"%s: %s\r\n" % (name.encode(), str(value).encode())
+        for cookie in self.cookies._cookies.values():
+            buf += b"Set-Cookie: %s\r\n" % str(cookie).encode()
+        return buf
 
     def add_header(self, name: str, value: str) -> None:
-        self.header_params[name] = HeaderParam(name, value)
+        self.header_params[name] = value
 
     def add_cookie(self, cookie=Cookie) -> None:
         self.cookies.add(cookie)
@@ -203,9 +243,7 @@ class Headers:
         self.cookies = cookies
 
     def dict(self) -> Dict[str, Any]:
-        d = self.cookies.dict()
-        for h in self.header_params.values():
-            d[h.name] = h.value
+        d = {**self.cookies.dict(), **self.header_params}
         if "cookie" in d:
             del d["cookie"]
         return d
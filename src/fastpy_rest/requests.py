@@ -1,12 +1,139 @@
-import json
 import asyncio
+from urllib.parse import unquote_plus
 from typing import Set, Dict, Callable, Optional
 from .core import Method, PathInfo, MethodWisePathsInfo
 from .params import QueryList, Headers, PathList, Body, Cookies
 from .exceptions import HttpException
+from .serialization import json_loads
+
+try:
+    import httptools
+except ImportError:
+    httptools = None
+
+
+def parse_query_string(s: str, pos: int = 0) -> Dict[str, str]:
+    '''
+    Parses name=value pairs separated by & starting at pos. A pair without = gets an empty value.
+    Names and values are url decoded, which is skipped when there is nothing to decode.
+    '''
+    queries = {}
+    end = len(s)
+    encoded = s.find("%", pos) >= 0 or s.find("+", pos) >= 0
+    while pos < end:
+        amp = s.find("&", pos)
+        if amp < 0:
+            amp = end
+        eq = s.find("=", pos, amp)
+        if eq < 0:
+            if amp > pos:
+                queries[s[pos:amp]] = ""
+        else:
+            queries[s[pos:eq]] = s[eq + 1:amp]
+        pos = amp + 1
+    if encoded:
+        return {unquote_plus(name): unquote_plus(value) for name, value in queries.items()}
+    return queries
+
+
+class RequestParser:
+    '''
+    Parses the request line and headers of a request. httptools is used when it is installed,
+    otherwise raw bytes are split in python. Header names are stored lowercased.
+    '''
+    __slots__ = ("method", "url", "target", "http_version", "headers", "content_length", "content_type", "body")
+
+    max_body_size = 16 * 1024 * 1024
+
+    def __init__(self) -> None:
+        self.method: Optional[str] = None
+        self.url = b""
+        self.target = ""
+        self.http_version: Optional[str] = None
+        self.headers: Dict[str, str] = {}
+        self.content_length: Optional[int] = None
+        self.content_type: Optional[bytes] = None
+        self.body: Optional[bytes] = None
+
+    def on_url(self, url: bytes) -> None:
+        self.url += url
+
+    def on_header(self, name: bytes, value: bytes) -> None:
+        name = name.lower()
+        value = value.strip()
+        if name == b"content-length":
+            if not value.isdigit():
+                raise ValueError("Invalid Content-Length.")
+            self.content_length = int(value)
+        elif name == b"content-type":
+            self.content_type = value.lower()
+        # Header bytes are latin-1 by spec, decoding them never fails unlike utf-8.
+        self.headers[name.decode("latin-1")] = value.decode("latin-1")
+
+    def feed_head(self, head: bytes) -> None:
+        '''
+        Parses the request head, i.e. everything up to and including the blank line.
+        '''
+        try:
+            if httptools is not None:
+                parser = httptools.HttpRequestParser(self)
+                parser.feed_data(head)
+                self.method = parser.get_method().decode()
+                self.http_version = parser.get_http_version()
+            else:
+                line_end = head.index(b"\r\n")
+                url_start = head.index(b" ", 0, line_end) + 1
+                url_end = head.index(b" ", url_start, line_end)
+                self.method = head[:url_start - 1].decode()
+                self.on_url(head[url_start:url_end])
+                # Skip " HTTP/" to get the bare version.
+                self.http_version = head[url_end + 6:line_end].decode()
+                for line in head[line_end + 2:-4].split(b"\r\n"):
+                    name, sep, value = line.partition(b":")
+                    if sep:
+                        self.on_header(name.strip(), value)
+            self.target = self.url.decode()
+        except Exception:
+            raise HttpException(400, "Malformed request.")
+
+    @property
+    def keep_alive(self) -> bool:
+        '''
+        Whether the connection can be reused for the next request. Only HTTP/1.1 connections are kept
+        alive, and only when the request body could be read completely.
+        '''
+        if self.http_version != "1.1" or "transfer-encoding" in self.headers:
+            return False
+        return "close" not in self.headers.get("connection", "").lower()
+
+    @classmethod
+    async def read_from(cls, reader: asyncio.StreamReader, head_timeout: Optional[float] = None) -> "RequestParser":
+        '''
+        Reads one whole request, i.e. head and body, from the reader. head_timeout only bounds the wait
+        for the head, a body which has been announced is read without it.
+        '''
+        parser = cls()
+        try:
+            if head_timeout is None:
+                head = await reader.readuntil(b"\r\n\r\n")
+            elif hasattr(asyncio, "timeout"):
+                async with asyncio.timeout(head_timeout):
+                    head = await reader.readuntil(b"\r\n\r\n")
+            else:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), head_timeout)
+        except asyncio.LimitOverrunError:
+            raise HttpException(431, "Request head too large.")
+        parser.feed_head(head)
+        if parser.content_length:
+            if parser.content_length > cls.max_body_size:
+                raise HttpException(413, "Request body too large.")
+            parser.body = await reader.readexactly(parser.content_length)
+        return parser
 
 
 class Request:
+    __slots__ = ("path", "method", "queries", "headers", "body", "path_params", "_path_info")
+
     def __init__(
         self,
         path: str,
@@ -25,6 +152,10 @@ class Request:
         self.path_params = path_params
         self._path_info = path_info
 
+    @property
+    def path_info(self) -> PathInfo:
+        return self._path_info
+
     @property
     def params(self) -> Set[str]:
         return self._path_info.var_types.keys()
@@ -51,55 +182,49 @@ class Request:
 
     @classmethod
     async def load_from_reader(cls, reader: asyncio.StreamReader, all_path_info: MethodWisePathsInfo) -> "Request":
-        request_line = await reader.readuntil(b"\r\n")
-        method, path, _ = request_line.decode().strip().split(" ")
-        headers = {}
+        parser = await RequestParser.read_from(reader)
+        return cls.from_parser(parser, all_path_info)
+
+    @classmethod
+    def from_parser(cls, parser: RequestParser, all_path_info: MethodWisePathsInfo) -> "Request":
+        '''
+        Routes and validates a request which has been read completely.
+        '''
+        method = parser.method
+        path = parser.target
+        headers = parser.headers
         queries = {}
         body = None
-        content_length = None
-        content_type = None
-        path_info = all_path_info.get_api_route_path_info(method, path)
-        if path_info is None:
+        content_type = parser.content_type
+
+        query_start = path.find("?")
+        if query_start >= 0:
+            queries = parse_query_string(path, query_start + 1)
+            path = path[:query_start]
+
+        matched = all_path_info.match_api_route(method, path)
+        if matched is None:
             raise HttpException(404, "No such route found.")
+        path_info, path_values = matched
+
+        if parser.body is not None:
+            if content_type is not None:
+                if content_type.startswith(b"application/json"):
+                    # Body models validate the raw json themselves, no need to parse it twice.
+                    if path_info.body is not None:
+                        body = parser.body
+                    else:
+                        try:
+                            body = json_loads(parser.body)
+                        except ValueError:
+                            raise HttpException(400, "Invalid json body.")
 
-        if "?" in path:
-            path, query_string = path.split("?", 1)
-            query_params = query_string.split("&")
-            for param in query_params:
-                name, value = param.split("=")
-                queries[name] = value
-
-        while True:
-            header_line = await reader.readuntil(b"\r\n")
-            header = header_line.decode().strip()
-            if not header:
-                break
-
-            header_name, header_value = header.split(":", 1)
-            if header_name.casefold().strip() == "content-length":
-                content_length = int(header_value.strip())
-            if header_name.casefold().strip() == "content-type":
-                content_type = header_value.casefold().strip()
-            headers[header_name.strip()] = header_value.strip()
-
-        if content_length is not None:
-            if content_length > 0:
-                body_data = await reader.readexactly(content_length)
-                if content_type is not None:
-                    if "application/json" in content_type:
-                        body = json.loads(body_data)
-
-        number_of_path_params = len(path_info.path_params)
-        splits = path.split("/")
-        path_vals = splits[-number_of_path_params:]
-        route = "/".join(splits[:-number_of_path_params])
-
-        verified_path_params = path_info.verify_path_params(*path_vals)
-        verified_query_params = path_info.verify_query_params(**queries)
-        verified_headers = path_info.verify_headers(**headers)
+        verified_path_params = path_info.verify_path_params(**path_values)
+        verified_query_params = path_info.verify_query_params(queries)
+        verified_headers = path_info.verify_headers(headers)
         verified_body = path_info.verify_body(body)
         return cls(
-            route,
+            path,
             method,
             verified_query_params,
             verified_headers,
@@ -1,11 +1,13 @@
 from typing import Optional
 from .params import Headers, Body, Cookies, Cookie
+from .exceptions import log_exception
 import asyncio
-import traceback
-from .status_codes import HTTP_STATUS_CODES
+from .status_codes import STATUS_LINE, status_line
 
 
 class Response:
+    __slots__ = ("status_code", "headers", "reponse_body")
+
     def __init__(
         self,
         status_code: int,
@@ -26,21 +28,34 @@ class Response:
     def set_cookies(self, cookies: Cookies) -> None:
         self.headers.set_cookies(cookies)
 
+    def to_bytes(self) -> bytearray:
+        '''
+        Builds the whole response in one buffer so that it is sent with a single write.
+        '''
+        buf = bytearray(status_line(self.status_code))
+        buf += self.headers.to_bytes()
+        body = b""
+        if self.reponse_body is not None and self.reponse_body.value is not None:
+            body = self.reponse_body.to_bytes()
+        if any(name.lower() == "content-length" for name in self.headers.header_params):
+            buf += b"\r\n"
+        else:
+            buf += b"Content-Length: %d\r\n\r\n" % len(body)
+        buf += body
+        return buf
+
     async def write_to_stream(self, writer: asyncio.StreamWriter) -> None:
         try:
-            writer.write(str(self).encode())
+            writer.write(self.to_bytes())
         except Exception as e:
-            print(e)
-            traceback.print_exc()
-            writer.write("HTTP/1.1 500 Internal Server\r\n".encode())
+            log_exception(e)
+            writer.write(STATUS_LINE[500] + b"Content-Length: 0\r\n\r\n")
         finally:
             await writer.drain()
-            writer.close()
 
     def __str__(self) -> str:
-        s = f"HTTP/1.1 {self.status_code} {HTTP_STATUS_CODES[self.status_code]}\r\n"
-        s += str(self.headers)
+        parts = [status_line(self.status_code).decode(), str(self.headers)]
         if self.reponse_body is not None and self.reponse_body.value is not None:
-            s += "\r\n"
-            s += str(self.reponse_body)
-        return s
+            parts.append("\r\n")
+            parts.append(str(self.reponse_body))
+        return "".join(parts)
@@ -0,0 +1,25 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def json_dumps(value: Any) -> bytes:
+        '''
+        Serializes given value to compact json bytes.
+        '''
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+    json_loads = orjson.loads
+else:
+    def json_dumps(value: Any) -> bytes:
+        '''
+        Serializes given value to compact json bytes.
+        '''
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    json_loads = json.loads
@@ -63,3 +63,17 @@ HTTP_STATUS_CODES = {
     510: "Not Extended",
     511: "Network Authentication Required"
 }
+
+STATUS_LINE = {
+    code: f"HTTP/1.1 {code} {reason}\r\n".encode("ascii") for code, reason in HTTP_STATUS_CODES.items()
+}
+
+
+def status_line(status_code: int) -> bytes:
+    '''
+    Returns the encoded status line for given code. Codes missing in the table get an empty reason phrase.
+    '''
+    line = STATUS_LINE.get(status_code)
+    if line is None:
+        line = f"HTTP/1.1 {status_code} \r\n".encode("ascii")
+    return line
@@ -6,10 +6,11 @@ sys.path.append('../')
 import unittest, asyncio
 from src.fastpy_rest.main import FastPy, RequestHandler
 from src.fastpy_rest.responses import Response
-from src.fastpy_rest.params import Headers, Body, Cookies, PathList, PathParam, QueryList
+from src.fastpy_rest.params import Headers, HeaderParam, Body, Cookie, Cookies, PathList, PathParam, QueryList
 from src.fastpy_rest.exceptions import HttpException
 from src.fastpy_rest.core import Method
-from src.fastpy_rest.requests import Request
+from src.fastpy_rest.requests import Request, RequestParser, parse_query_string
+from src.fastpy_rest import requests as fastpy_requests
 from src.fastpy_rest.status_codes import HTTP_STATUS_CODES
 
 class TestFastPy(unittest.TestCase):
@@ -41,11 +42,147 @@ class TestFastPy(unittest.TestCase):
         context = self.app._method_wise_path_info.get_api_route_path_info(Method.POST, "/wrong")
         self.assertEqual(context, None)
 
+    def test_route_with_multiple_path_params(self):
+        @self.app.get("/users/{user_id}/posts/{post_id}")
+        async def test_handler(user_id: int, post_id: str):
+            return "Test Route"
+
+        @self.app.get("/users/me/posts/{post_id}")
+        async def test_handler_me(post_id: str):
+            return "Test Route Me"
+
+        path_info, path_params = self.app._method_wise_path_info.match_api_route(Method.GET, "/users/12/posts/abc/")
+        self.assertEqual(path_info.handler.__name__, "test_handler")
+        self.assertEqual(path_params, {"user_id": 12, "post_id": "abc"})
+
+        path_info, path_params = self.app._method_wise_path_info.match_api_route(Method.GET, "/users/me/posts/abc")
+        self.assertEqual(path_info.handler.__name__, "test_handler_me")
+        self.assertEqual(path_params, {"post_id": "abc"})
+
+        self.assertIsNone(self.app._method_wise_path_info.match_api_route(Method.GET, "/users/12/posts"))
+
+    def test_conflicting_routes(self):
+        @self.app.get("/items/{item_id}")
+        async def test_handler(item_id: int):
+            return item_id
+
+        with self.assertRaises(ValueError):
+            @self.app.get("/items/{name}")
+            async def test_handler_name(name: str):
+                return name
+
+        with self.assertRaises(ValueError):
+            @self.app.get("/items/{item_id}/")
+            async def test_handler_again(item_id: int):
+                return item_id
+
+        path_info, path_params = self.app._method_wise_path_info.match_api_route(Method.GET, "/items/5")
+        self.assertEqual(path_info.handler.__name__, "test_handler")
+        self.assertEqual(path_params, {"item_id": 5})
+
+    def test_query_params_defaults(self):
+        @self.app.get("/search")
+        async def test_handler(q: str, page: int = 1):
+            return "Test Route"
+
+        path_info = self.app._method_wise_path_info.get_api_route_path_info(Method.GET, "/search")
+        self.assertEqual(path_info.verify_query_params({"q": "a", "extra": "x"}).dict(), {"q": "a", "extra": "x", "page": 1})
+        self.assertEqual(path_info.verify_query_params({"q": "a", "page": "3"}).dict(), {"q": "a", "page": 3})
+        with self.assertRaises(HttpException):
+            path_info.verify_query_params({"page": "3"})
+
+    def test_cookies_from_string(self):
+        cookies = Cookies.from_string("session=YWJj==; theme=dark;lang= en")
+
+        self.assertEqual(cookies.dict(), {"session": "YWJj==", "theme": "dark", "lang": "en"})
+
+    def test_response_set_cookies(self):
+        response = Response(200, Headers(), Body(None))
+        response.add_cookie(Cookie("theme", "dark", path="/"))
+        response.cookies.update_cookie("sid", "1")
+
+        self.assertEqual(
+            bytes(response.to_bytes()),
+            b"HTTP/1.1 200 OK\r\nSet-Cookie: theme=dark; Path=/\r\nSet-Cookie: sid=1\r\nContent-Length: 0\r\n\r\n"
+        )
+        self.assertEqual(Headers(cookies=Cookies.from_string("sid=1")).to_bytes(), b"")
+
+    def test_parse_query_string(self):
+        queries = parse_query_string("/search?q=a%20b+c&page=2&flag&&eq=a=b", 8)
+
+        self.assertEqual(queries, {"q": "a b c", "page": "2", "flag": "", "eq": "a=b"})
+
+    def test_fallback_request_parser(self):
+        httptools = fastpy_requests.httptools
+        fastpy_requests.httptools = None
+        try:
+            parser = RequestParser()
+            parser.feed_head(
+                b"POST /items?a=1 HTTP/1.1\r\nHost:  a \r\nContent-Type: Application/JSON\r\n"
+                b"Content-Length: 2\r\n" + b" " * 4000 + b"\r\n\r\n"
+            )
+        finally:
+            fastpy_requests.httptools = httptools
+
+        self.assertEqual(parser.method, "POST")
+        self.assertEqual(parser.url, b"/items?a=1")
+        self.assertEqual(parser.http_version, "1.1")
+        self.assertEqual(parser.headers, {"host": "a", "content-type": "Application/JSON", "content-length": "2"})
+        self.assertEqual(parser.content_type, b"application/json")
+        self.assertEqual(parser.content_length, 2)
+
+    def test_keep_alive_pipelined_requests(self):
+        @self.app.get("/items/{item_id}")
+        async def test_handler(item_id: int):
+            return item_id
+
+        RequestHandler._app = self.app
+
+        class Writer:
+            def __init__(self):
+                self.data = bytearray()
+                self.closed = False
+
+            def write(self, data):
+                self.data += data
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                self.closed = True
+
+            async def wait_closed(self):
+                pass
+
+        async def serve():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"GET /items/1 HTTP/1.1\r\nHost: a\r\n\r\nGET /items/2 HTTP/1.1\r\nHost: a\r\n\r\n")
+            reader.feed_eof()
+            writer = Writer()
+            await RequestHandler.handle_request(reader, writer)
+            return writer
+
+        writer = asyncio.run(serve())
+        self.assertEqual(writer.data.count(b"HTTP/1.1 200 OK\r\n"), 2)
+        self.assertTrue(writer.data.endswith(b"Content-Length: 1\r\n\r\n2"))
+        self.assertTrue(writer.closed)
+
     def test_response_format(self):
         response = Response(200, Headers(), Body("Hello, World!"))
 
         expected_response = f"HTTP/1.1 200 {HTTP_STATUS_CODES[200]}\r\n\r\nHello, World!"
         self.assertEqual(str(response), expected_response)
 
+    def test_response_to_bytes(self):
+        response = Response(200, Headers(header_params=[HeaderParam("Content-Type", "text/plain")]), Body("Hello"))
+        self.assertEqual(
+            bytes(response.to_bytes()),
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 5\r\n\r\nHello"
+        )
+
+        response = Response(200, Headers(header_params=[HeaderParam("content-length", "5")]), Body("Hello"))
+        self.assertEqual(bytes(response.to_bytes()), b"HTTP/1.1 200 OK\r\ncontent-length: 5\r\n\r\nHello")
+
 if __name__ == '__main__':
     unittest.main()